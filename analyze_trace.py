@@ -1,209 +1,524 @@
+import os
 import re
 import sys
+import mmap
+import multiprocessing
 import argparse
 from datetime import datetime
-from collections import defaultdict
+from array import array
+from collections import Counter
+from itertools import islice
+
+# Вся строка разбирается одним скомпилированным шаблоном за один проход:
+# событие (r, +, -), время, номер узла, длина пакета и, если есть TcpHeader,
+# порт источника, флаги в квадратных скобках и номер последовательности.
+# Ручной разбор через str.split/str.find здесь не быстрее: каждый find, срез
+# и проверка формата - отдельный вызов из байткода, и на строках NS-3 такой
+# парсер оказался примерно в 1.3 раза медленнее, чем один вызов match().
+# Строки читаются из mmap как bytes, поэтому и шаблон байтовый.
+_LINE_RE = re.compile(
+    rb'^[r+\-]\s+(?P<time>\d+\.\d+)\s+/NodeList/(?P<node>\d+)/'
+    rb'.*length:\s*(?P<length>\d+)'
+    rb'(?:.*?TcpHeader\s*\((?P<sport>\d+)\s*>\s*\d+'
+    rb'(?:\s*\[(?P<flags>[^\]]*)\])?'
+    rb'(?:.*?Seq=(?P<seq>\d+))?)?'
+)
+
+# Типы пакетов - общие интернированные строки: разбор не создает новых
+# объектов, а ключи счетчиков сравниваются по указателю
+_DATA = sys.intern('Data')
+_SYN = sys.intern('SYN')
+_FIN = sys.intern('FIN')
+_RST = sys.intern('RST')
+_ACK = sys.intern('ACK')
+_UNKNOWN = sys.intern('Unknown')
+
+# Минимальный размер части файла для отдельного процесса. Каждая лишняя
+# часть стоит запуска процесса, передачи результата и последовательного
+# объединения в родителе - около 12 мс, тогда как 32 МБ разбираются
+# примерно за 0.3 с, так что накладные расходы не превышают нескольких
+# процентов от разбора части
+_MIN_CHUNK_SIZE = 32 * 1024 * 1024
+
+# Битовая карта увиденных пар (узел, Seq) для поиска повторных передач:
+# один бит на пару вместо объекта int в множестве. Разные пары могут попасть
+# в один бит, поэтому число повторов может быть немного занижено. Размер
+# карты - степень двойки с запасом _SEEN_BITS_PER_LINE бит на каждую строку
+# файла (строка NS-3 не короче _MIN_LINE_BYTES байт), но не больше
+# _MAX_SEEN_BITS.
+_MIN_LINE_BYTES = 64
+_SEEN_BITS_PER_LINE = 16
+_MIN_SEEN_BITS = 1 << 16
+_MAX_SEEN_BITS = 1 << 28
+
+# Тип пакета по битовой маске флагов: 1 - SYN, 2 - FIN, 4 - RST, 8 - ACK.
+# Приоритет SYN > FIN > RST > ACK > Data заложен в саму таблицу.
+_PACKET_TYPES = tuple(
+    _SYN if mask & 1 else
+    _FIN if mask & 2 else
+    _RST if mask & 4 else
+    _ACK if mask & 8 else
+    _DATA
+    for mask in range(16)
+)
+
+# Кэш типов по значению флагов (например, b'SYN|ACK'): пара
+# (тип длинного пакета, тип пакета не длиннее 60 байт), т.к. ACK
+# учитывается только для коротких пакетов
+_PACKET_TYPES_BY_FLAGS = {}
+
+# Сколько строк разбирается между свертками столбцов в итоговые счетчики:
+# столбцы пакета остаются небольшими и не растут вместе с файлом
+_BATCH_LINES = 4096
+
+# Сколько проблемных строк выводится в отчет
+_MAX_PROBLEMATIC_LINES = 10
+
+# По скольким первым строкам диапазона определяется формат трассировки
+_SAMPLE_LINES = 100
+
+# Сгенерированные разборщики по признакам формата (см. _make_parser)
+_PARSERS = {}
+
+def _flags_packet_types(flags):
+    """Вычисляет и кэширует пару типов пакета для значения флагов TCP."""
+    mask = (
+        (b'SYN' in flags)
+        | (b'FIN' in flags) << 1
+        | (b'RST' in flags) << 2
+        | (b'ACK' in flags) << 3
+    )
+    types = (_PACKET_TYPES[mask & 7], _PACKET_TYPES[mask])
+    _PACKET_TYPES_BY_FLAGS[flags] = types
+    return types
 
 def parse_trace_line(line):
     """
     Улучшенный парсер для строк трассировки NS-3.
     Обрабатывает различные форматы TCP заголовков и событий.
+    Возвращает кортеж (event_type, time, node_id, packet_size, seq, packet_type)
+    или None, если строка не разобрана. event_type - код символа события
+    (ord('r'), ord('+') или ord('-')), в строку он переводится только в отчете.
+    Если номер последовательности не найден, seq равен None, а тип пакета -
+    'Unknown'; такие пакеты не участвуют в поиске повторных передач.
     """
-    # Основные компоненты для разбора
-    event_pattern = r'^([r+\-])'  # событие: r, +, -
-    time_pattern = r'\s+(\d+\.\d+)'  # время
-    node_pattern = r'\s+/NodeList/(\d+)/'  # номер узла
-    
-    # Более гибкое извлечение длины пакета
-    length_pattern = r'length:\s*(\d+)'
-    
-    # Разные варианты TCP заголовков
-    tcp_patterns = [
-        # Стандартный формат с Seq
-        r'Seq=(\d+)',
-        # Формат с квадратными скобками и флагами
-        r'\[([^\]]+)\].*Seq=(\d+)',
-        # Минимальный формат - просто ищем числа после Seq=
-        r'.*Seq=(\d+)',
-    ]
-    
-    # Сначала извлекаем базовую информацию
-    base_match = re.match(f'{event_pattern}{time_pattern}{node_pattern}.*{length_pattern}', line)
-    if not base_match:
+    match = _LINE_RE.match(line)
+    if not match:
         return None
     
-    event_type, time_str, node_str, length_str = base_match.groups()
-    
-    # Ищем TCP последовательность и флаги
-    seq_number = None
-    tcp_flags = []
+    # Группы извлекаются по одной и только когда нужны, без groupdict()
+    group = match.group
+    packet_size = int(group('length'))
     
-    for pattern in tcp_patterns:
-        tcp_match = re.search(pattern, line)
-        if tcp_match:
-            groups = tcp_match.groups()
-            if len(groups) == 1:
-                seq_number = int(groups[0])
-            elif len(groups) == 2:
-                tcp_flags = groups[0].split('|')
-                seq_number = int(groups[1])
-            break
-    
-    # Если не нашли Seq, попробуем найти по другому шаблону
-    if seq_number is None:
-        # Ищем числа в контексте TCP
-        numbers_match = re.search(r'TcpHeader.*?(\d+)\s*>\s*(\d+)', line)
-        if numbers_match:
-            # Берем первый номер как последовательность (упрощенно)
-            seq_number = int(numbers_match.group(1))
+    # Если Seq нет, берем порт источника из TcpHeader (упрощенно)
+    seq_str = group('seq') or group('sport')
+    if seq_str is None:
+        seq_number = None
+        packet_type = _UNKNOWN
+    else:
+        seq_number = int(seq_str)
+
+        # Определяем тип пакета по флагам из квадратных скобок, например b'SYN|ACK'
+        flags = group('flags')
+        if flags:
+            types = _PACKET_TYPES_BY_FLAGS.get(flags) or _flags_packet_types(flags)
+            packet_type = types[packet_size <= 60]
+        else:
+            packet_type = _DATA
     
-    # Если все еще нет последовательности, используем хэш строки как fallback
-    if seq_number is None:
-        seq_number = hash(line) % 1000000
+    return (
+        line[0],
+        float(group('time')),
+        int(group('node')),
+        packet_size,
+        seq_number,
+        packet_type,
+    )
+
+def _make_parser(sample_lines):
+    """
+    Возвращает функцию разбора, специализированную под формат трассировки.
+    По первым строкам определяется, всегда ли у TCP-пакетов есть флаги
+    в квадратных скобках и Seq=; обязательные поля разбираются без
+    проверок. Строки, не подошедшие под специализированный шаблон
+    (например, без TcpHeader), разбираются parse_trace_line.
+    """
+    tcp_matches = [
+        match for match in map(_LINE_RE.match, sample_lines)
+        if match and match.group('sport') is not None
+    ]
+    if not tcp_matches:
+        return parse_trace_line
+
+    flags_always = all(match.group('flags') is not None for match in tcp_matches)
+    seq_always = all(match.group('seq') is not None for match in tcp_matches)
+    key = (flags_always, seq_always)
+    if key not in _PARSERS:
+        _PARSERS[key] = _compile_parser(flags_always, seq_always)
+    return _PARSERS[key]
+
+def _compile_parser(flags_always, seq_always):
+    """Генерирует и компилирует исходный код специализированного разборщика."""
+    # Порт источника нужен, только если Seq может отсутствовать
+    pattern = (
+        rb'^[r+\-]\s+(\d+\.\d+)\s+/NodeList/(\d+)/'
+        rb'.*length:\s*(\d+)'
+        + (rb'.*?TcpHeader\s*\(\d+\s*>\s*\d+' if seq_always else
+           rb'.*?TcpHeader\s*\((\d+)\s*>\s*\d+')
+        + (rb'\s*\[([^\]]*)\]' if flags_always else rb'(?:\s*\[([^\]]*)\])?')
+        + (rb'.*?Seq=(\d+)' if seq_always else rb'(?:.*?Seq=(\d+))?')
+    )
+
+    src = [
+        'def parse(line):',
+        '    match = _match(line)',
+        '    if match is None:',
+        '        return _parse_generic(line)',
+    ]
+    if seq_always:
+        src += [
+            '    time, node, length, flags, seq = match.groups()',
+            '    seq_number = int(seq)',
+        ]
+    else:
+        src += [
+            '    time, node, length, sport, flags, seq = match.groups()',
+            '    seq_number = int(seq or sport)',
+        ]
+    src.append('    packet_size = int(length)')
+    if flags_always:
+        src += [
+            '    types = _types_by_flags.get(flags) or _flags_types(flags)',
+            '    packet_type = types[packet_size <= 60]',
+        ]
+    else:
+        src += [
+            '    if flags:',
+            '        types = _types_by_flags.get(flags) or _flags_types(flags)',
+            '        packet_type = types[packet_size <= 60]',
+            '    else:',
+            '        packet_type = _DATA',
+        ]
+    src.append('    return line[0], float(time), int(node), packet_size, seq_number, packet_type')
+
+    namespace = {
+        '_match': re.compile(pattern).match,
+        '_parse_generic': parse_trace_line,
+        '_types_by_flags': _PACKET_TYPES_BY_FLAGS,
+        '_flags_types': _flags_packet_types,
+        '_DATA': _DATA,
+    }
+    exec(compile('\n'.join(src), '<parser>', 'exec'), namespace)
+    return namespace['parse']
+
+def iter_trace_lines(input_file, start=0, end=None):
+    """
+    Построчно читает файл трассировки через mmap.
+    Строки возвращаются как bytes вместе с символом перевода строки.
+    start и end задают диапазон байтов; границы должны совпадать с началом строк.
+    """
+    with open(input_file, 'rb') as f:
+        # Пустой файл отобразить в память нельзя
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if end is None:
+                end = len(mm)
+            mm.seek(start)
+            readline = mm.readline
+            while start < end:
+                line = readline()
+                start += len(line)
+                yield line
+
+def _seen_bits_count(file_size):
+    """Число битов в карте повторных передач для файла заданного размера."""
+    wanted = file_size // _MIN_LINE_BYTES * _SEEN_BITS_PER_LINE
+    return min(_MAX_SEEN_BITS, max(_MIN_SEEN_BITS, 1 << wanted.bit_length()))
+
+def split_trace_chunks(input_file, jobs):
+    """
+    Делит файл трассировки на диапазоны байтов для параллельной обработки.
+    Границы диапазонов выравниваются по концам строк. Каждый диапазон
+    описывается кортежем (input_file, start, end, seen_bits_count,
+    collect_keys); размер битовой карты общий для всех частей, чтобы их
+    ключи совпадали. Впервые увиденные ключи собираются для объединения,
+    только если частей больше одной.
+    """
+    size = os.path.getsize(input_file)
+    seen_bits_count = _seen_bits_count(size)
+    chunks_count = max(1, min(jobs, size // _MIN_CHUNK_SIZE))
+    if chunks_count == 1:
+        return [(input_file, 0, size, seen_bits_count, False)]
+
+    chunks = []
+    with open(input_file, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            start = 0
+            for i in range(1, chunks_count):
+                cut = mm.rfind(b'\n', start, size * i // chunks_count)
+                # Строка длиннее целого диапазона - присоединяем его к следующему
+                if cut < 0:
+                    continue
+                chunks.append((input_file, start, cut + 1, seen_bits_count, True))
+                start = cut + 1
+            chunks.append((input_file, start, size, seen_bits_count, True))
+    # Все границы пропущены - остался один диапазон, объединять нечего
+    if len(chunks) == 1:
+        return [(input_file, 0, size, seen_bits_count, False)]
+    return chunks
+
+def _merge_seen_keys(seen_bits, keys):
+    """
+    Отмечает в общей битовой карте ключи, впервые увиденные в одной части.
+    Возвращает число ключей, уже отмеченных предыдущими частями.
+    """
+    repeated = 0
+    for key in keys:
+        bit = 1 << (key & 7)
+        key >>= 3
+        if seen_bits[key] & bit:
+            repeated += 1
+        else:
+            seen_bits[key] |= bit
+    return repeated
+
+def _analyze_chunk(chunk):
+    """
+    Собирает частичные метрики по одному диапазону файла трассировки.
+    Вызывается в рабочем процессе; результат объединяет analyze_trace.
+    """
+    input_file, start, end, seen_bits_count, collect_keys = chunk
+
+    total_packets = 0
+    retransmitted_packets = 0
+    total_bytes = 0
+    start_time = None
+    end_time = 0
+    flow_nodes = set()
+    packet_types = Counter()
+    events_by_type = Counter()
     
-    # Определяем тип пакета по содержимому
-    packet_type = "Data"
-    if any(flag in line for flag in ['[SYN]', 'SYN']):
-        packet_type = "SYN"
-        tcp_flags.append('SYN')
-    elif any(flag in line for flag in ['[FIN]', 'FIN']):
-        packet_type = "FIN" 
-        tcp_flags.append('FIN')
-    elif any(flag in line for flag in ['[RST]', 'RST']):
-        packet_type = "RST"
-        tcp_flags.append('RST')
-    elif 'ACK' in line and int(length_str) <= 60:
-        packet_type = "ACK"
-        tcp_flags.append('ACK')
+    # Поля разобранных строк копятся по столбцам в пределах пакета из
+    # _BATCH_LINES строк, а затем столбцы целиком сворачиваются в итоговые
+    # метрики (sum, min, max, Counter.update) и очищаются
+    times = array('d')
+    event_list = []
+    packet_type_list = []
+    # Только для пакетов с данными и ACK
+    data_sizes = array('q')
+    data_nodes = array('q')
+
+    # Для поиска ретрансмитов увиденные пары (узел, Seq) отмечаются
+    # в битовой карте. Если частей несколько, впервые отмеченные ключи
+    # копятся отдельно: при объединении передаются только они, а не вся карта.
+    seen_bits = bytearray(seen_bits_count // 8)
+    seen_mask = seen_bits_count - 1
+    new_keys = array('q')
     
-    return {
-        'event_type': event_type,
-        'time': float(time_str),
-        'node_id': int(node_str),
-        'packet_size': int(length_str),
-        'seq': seq_number,
-        'flags': tcp_flags,
-        'packet_type': packet_type,
-        'raw_line': line.strip()  # Сохраняем исходную строку для отладки
-    }
+    # Статистика для отладки
+    parsed_lines = 0
+    failed_lines = 0
+    problematic_lines = []
+
+    # Горячий цикл: парсер и методы столбцов связаны с локальными именами,
+    # чтобы не искать их на каждой строке
+    add_time = times.append
+    add_event = event_list.append
+    add_packet_type = packet_type_list.append
+    add_data_size = data_sizes.append
+    add_data_node = data_nodes.append
+    add_new_key = new_keys.append
+    lines = enumerate(iter_trace_lines(input_file, start, end), 1)
+    batch = list(islice(lines, _BATCH_LINES))
+    # Разборщик специализируется под формат по первым строкам диапазона
+    parse = _make_parser([line for _, line in batch[:_SAMPLE_LINES]])
+    line_num = 0
+    while batch:
+        for line_num, line in batch:
+            # Отдельный быстрый фильтр (первый байт, наличие "length:") перед
+            # разбором не нужен: _LINE_RE привязан к началу строки и отбрасывает
+            # комментарии и заголовки на первом символе, а почти все строки
+            # трассировки - события, для которых такая проверка лишняя работа
+            data = parse(line)
+            if data is None:
+                # Пустые строки не считаются ошибками разбора
+                if not line.strip():
+                    continue
+                failed_lines += 1
+                if len(line.strip()) > 10 and len(problematic_lines) < _MAX_PROBLEMATIC_LINES:
+                    problematic_lines.append(
+                        (line_num, line.strip()[:100].decode('utf-8', errors='replace')))
+                continue
+
+            event_type, time, node_id, packet_size, seq, packet_type = data
+            add_time(time)
+            add_event(event_type)
+            add_packet_type(packet_type)
+
+            # Учитываем только пакеты с данными для некоторых метрик; пакеты
+            # без TcpHeader (Unknown) тоже несут данные
+            if packet_type is _DATA or packet_type is _ACK or packet_type is _UNKNOWN:
+                add_data_size(packet_size)
+                add_data_node(node_id)
+
+                # Проверка на повторную передачу (упрощенно): повтор - это уже
+                # встречавшийся на узле номер Seq. Пакеты без Seq не проверяются
+                if seq is not None:
+                    key = (node_id * 2654435761 ^ seq) & seen_mask
+                    bit = 1 << (key & 7)
+                    index = key >> 3
+                    if seen_bits[index] & bit:
+                        retransmitted_packets += 1
+                    else:
+                        seen_bits[index] |= bit
+                        if collect_keys:
+                            add_new_key(key)
 
-def analyze_tcp_flags(flags_list):
-    """Анализирует TCP флаги."""
-    flags_dict = {
-        'SYN': any('SYN' in flag for flag in flags_list),
-        'ACK': any('ACK' in flag for flag in flags_list),
-        'FIN': any('FIN' in flag for flag in flags_list),
-        'RST': any('RST' in flag for flag in flags_list),
-        'PSH': any('PSH' in flag for flag in flags_list),
+        # Свертка столбцов пакета в итоговые метрики
+        if times:
+            parsed_lines += len(times)
+            batch_start = min(times)
+            if start_time is None or batch_start < start_time:
+                start_time = batch_start
+            end_time = max(end_time, max(times))
+        total_packets += len(data_sizes)
+        total_bytes += sum(data_sizes)
+        flow_nodes.update(data_nodes)
+        events_by_type.update(event_list)
+        packet_types.update(packet_type_list)
+
+        del times[:], data_sizes[:], data_nodes[:]
+        event_list.clear()
+        packet_type_list.clear()
+        batch = list(islice(lines, _BATCH_LINES))
+
+    if retransmitted_packets:
+        packet_types['Retransmissions'] = retransmitted_packets
+
+    return {
+        'total_packets': total_packets,
+        'retransmitted_packets': retransmitted_packets,
+        'total_bytes': total_bytes,
+        'start_time': start_time,
+        'end_time': end_time,
+        # Поток определяется узлом
+        'flow_nodes': flow_nodes,
+        'new_keys': new_keys,
+        'packet_types': packet_types,
+        'events_by_type': events_by_type,
+        'line_count': line_num,
+        'parsed_lines': parsed_lines,
+        'failed_lines': failed_lines,
+        'problematic_lines': problematic_lines,
     }
-    return flags_dict
 
-def analyze_trace(input_file, output_file):
+def analyze_trace(input_file, output_file, jobs=None):
     """
     Анализирует файл трассировки и собирает метрики.
+    Большие файлы делятся на части, которые разбираются в jobs процессах.
     """
     total_packets = 0
     retransmitted_packets = 0
     total_bytes = 0
     start_time = None
     end_time = 0
-    
+
     # Для отслеживания потоков и ретрансмитов
-    flows = defaultdict(lambda: {'seen_seqs': set(), 'packet_count': 0})
-    packet_types = defaultdict(int)
-    events_by_type = defaultdict(int)
-    
+    flow_nodes = set()
+    seen_bits = None
+    packet_types = Counter()
+    events_by_type = Counter()
+
     # Статистика для отладки
     parsed_lines = 0
     failed_lines = 0
     problematic_lines = []
 
-    with open(input_file, 'r') as f:
-        for line_num, line in enumerate(f, 1):
-            if not line.strip():
-                continue
+    chunks = split_trace_chunks(input_file, jobs or os.cpu_count() or 1)
+    if len(chunks) == 1:
+        parts = [_analyze_chunk(chunks[0])]
+    else:
+        # Общая карта ключей всех частей; размер у всех частей одинаковый
+        seen_bits = bytearray(chunks[0][3] // 8)
+        with multiprocessing.Pool(len(chunks)) as pool:
+            parts = pool.map(_analyze_chunk, chunks)
 
-            data = parse_trace_line(line)
-            if not data:
-                failed_lines += 1
-                if len(line.strip()) > 10:
-                    problematic_lines.append((line_num, line.strip()[:100]))
-                continue
+    # Части объединяются в порядке следования в файле
+    line_offset = 0
+    for part in parts:
+        total_packets += part['total_packets']
+        retransmitted_packets += part['retransmitted_packets']
+        total_bytes += part['total_bytes']
+        if part['start_time'] is not None:
+            if start_time is None or part['start_time'] < start_time:
+                start_time = part['start_time']
+        end_time = max(end_time, part['end_time'])
+
+        events_by_type += part['events_by_type']
+        packet_types += part['packet_types']
+
+        # Номера последовательности, уже встречавшиеся в предыдущих частях,
+        # тоже считаются повторными передачами
+        flow_nodes |= part['flow_nodes']
+        if len(chunks) > 1:
+            repeated = _merge_seen_keys(seen_bits, part['new_keys'])
+            if repeated:
+                retransmitted_packets += repeated
+                packet_types['Retransmissions'] += repeated
 
-            parsed_lines += 1
-            events_by_type[data['event_type']] += 1
-
-            # Обновляем временные рамки
-            if start_time is None:
-                start_time = data['time']
-            end_time = max(end_time, data['time'])
-
-            # Анализ TCP флагов
-            flags_info = analyze_tcp_flags(data['flags'])
-            
-            # Классификация пакетов по типу
-            packet_types[data['packet_type']] += 1
-
-            # Учитываем только пакеты с данными для некоторых метрик
-            if data['packet_type'] in ['Data', 'ACK']:
-                total_packets += 1
-                total_bytes += data['packet_size']
-
-                # Создаем идентификатор потока
-                flow_id = f"node_{data['node_id']}_seq_{data['seq']}"
-                
-                # Проверка на повторную передачу (упрощенно)
-                if data['seq'] in flows[flow_id]['seen_seqs']:
-                    retransmitted_packets += 1
-                    packet_types['Retransmissions'] += 1
-                else:
-                    flows[flow_id]['seen_seqs'].add(data['seq'])
-                    flows[flow_id]['packet_count'] += 1
+        parsed_lines += part['parsed_lines']
+        failed_lines += part['failed_lines']
+        problematic_lines.extend(
+            (line_offset + line_num, line_content)
+            for line_num, line_content in part['problematic_lines'])
+        line_offset += part['line_count']
 
     # Расчет метрик
     duration = end_time - start_time if start_time else 0
     speed_bps = (total_bytes * 8) / duration if duration > 0 else 0
     
     # Дополнительные метрики
-    unique_flows = len(flows)
+    unique_flows = len(flow_nodes)
     avg_packets_per_flow = total_packets / unique_flows if unique_flows > 0 else 0
     retransmission_rate = (retransmitted_packets / total_packets * 100) if total_packets > 0 else 0
 
-    # Запись результатов
+    # Отчет собирается в список и записывается в файл одним вызовом
+    out = []
+    out.append(f"Анализ трассировки: {input_file}\n")
+    out.append(f"Дата анализа: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+
+    out.append(f"\n--- СТАТИСТИКА ОБРАБОТКИ ---\n")
+    out.append(f"Успешно обработано строк: {parsed_lines}\n")
+    out.append(f"Не удалось обработать: {failed_lines}\n")
+    out.append(f"Процент успешной обработки: {parsed_lines/(parsed_lines+failed_lines)*100:.1f}%\n")
+
+    out.append(f"\n--- РАСПРЕДЕЛЕНИЕ СОБЫТИЙ ---\n")
+    out.extend(f"{chr(event_type)}: {count} событий\n" for event_type, count in events_by_type.items())
+
+    out.append(f"\n--- ОСНОВНЫЕ МЕТРИКИ ---\n")
+    out.append(f"Общее число пакетов с данными: {total_packets}\n")
+    out.append(f"Число повторных передач: {retransmitted_packets}\n")
+    out.append(f"Уровень ретрансмиссии: {retransmission_rate:.2f}%\n")
+    out.append(f"Общий объём данных: {total_bytes} байт ({total_bytes/1024:.2f} KB)\n")
+    out.append(f"Длительность передачи: {duration:.3f} сек\n")
+    out.append(f"Средняя скорость: {speed_bps:.2f} бит/сек ({speed_bps/1e6:.2f} Мбит/сек)\n")
+
+    out.append(f"\n--- СТАТИСТИКА ПО ТИПАМ ПАКЕТОВ ---\n")
+    out.extend(f"{pkt_type}: {count} пакетов\n" for pkt_type, count in packet_types.items())
+
+    out.append(f"\n--- ИНФОРМАЦИЯ О ПОТОКАХ ---\n")
+    out.append(f"Уникальных потоков: {unique_flows}\n")
+    out.append(f"Среднее пакетов на поток: {avg_packets_per_flow:.1f}\n")
+
+    # Добавляем информацию о проблемных строках для отладки
+    if problematic_lines:
+        out.append(f"\n--- ПРОБЛЕМНЫЕ СТРОКИ (первые {_MAX_PROBLEMATIC_LINES}) ---\n")
+        out.extend(f"Строка {line_num}: {line_content}...\n"
+                   for line_num, line_content in problematic_lines[:_MAX_PROBLEMATIC_LINES])
+
     with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(f"Анализ трассировки: {input_file}\n")
-        f.write(f"Дата анализа: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-        
-        f.write(f"\n--- СТАТИСТИКА ОБРАБОТКИ ---\n")
-        f.write(f"Успешно обработано строк: {parsed_lines}\n")
-        f.write(f"Не удалось обработать: {failed_lines}\n")
-        f.write(f"Процент успешной обработки: {parsed_lines/(parsed_lines+failed_lines)*100:.1f}%\n")
-        
-        f.write(f"\n--- РАСПРЕДЕЛЕНИЕ СОБЫТИЙ ---\n")
-        for event_type, count in events_by_type.items():
-            f.write(f"{event_type}: {count} событий\n")
-        
-        f.write(f"\n--- ОСНОВНЫЕ МЕТРИКИ ---\n")
-        f.write(f"Общее число пакетов с данными: {total_packets}\n")
-        f.write(f"Число повторных передач: {retransmitted_packets}\n")
-        f.write(f"Уровень ретрансмиссии: {retransmission_rate:.2f}%\n")
-        f.write(f"Общий объём данных: {total_bytes} байт ({total_bytes/1024:.2f} KB)\n")
-        f.write(f"Длительность передачи: {duration:.3f} сек\n")
-        f.write(f"Средняя скорость: {speed_bps:.2f} бит/сек ({speed_bps/1e6:.2f} Мбит/сек)\n")
-        
-        f.write(f"\n--- СТАТИСТИКА ПО ТИПАМ ПАКЕТОВ ---\n")
-        for pkt_type, count in packet_types.items():
-            f.write(f"{pkt_type}: {count} пакетов\n")
-        
-        f.write(f"\n--- ИНФОРМАЦИЯ О ПОТОКАХ ---\n")
-        f.write(f"Уникальных потоков: {unique_flows}\n")
-        f.write(f"Среднее пакетов на поток: {avg_packets_per_flow:.1f}\n")
-        
-        # Добавляем информацию о проблемных строках для отладки
-        if problematic_lines:
-            f.write(f"\n--- ПРОБЛЕМНЫЕ СТРОКИ (первые 10) ---\n")
-            for i, (line_num, line_content) in enumerate(problematic_lines[:10]):
-                f.write(f"Строка {line_num}: {line_content}...\n")
+        f.write(''.join(out))
 
     print(f"Анализ завершен. Результаты сохранены в {output_file}")
     print(f"Обработано: {parsed_lines} строк, Проблемных: {failed_lines}")
@@ -214,11 +529,13 @@ def main():
     parser.add_argument("input_file", help="Входной файл трассировки (например, bbr-experiment.tr)")
     parser.add_argument("-o", "--output", default="analysis_results.txt", 
                        help="Выходной файл для результатов (по умолчанию: analysis_results.txt)")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                       help="Число процессов для разбора (по умолчанию: число ядер)")
     
     args = parser.parse_args()
 
     try:
-        analyze_trace(args.input_file, args.output)
+        analyze_trace(args.input_file, args.output, args.jobs)
     except FileNotFoundError:
         print(f"Ошибка: Файл {args.input_file} не найден")
         sys.exit(1)
@@ -0,0 +1,222 @@
+#! /usr/bin/env python3
+#
+# SPDX-License-Identifier: GPL-2.0-only
+#
+
+"""!
+Test suite for the analyze_trace.py trace analysis script
+"""
+
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+# Get path containing analyze_trace.py
+ns3_path = os.path.dirname(os.path.abspath(os.sep.join([__file__, "../../"])))
+sys.path.insert(0, ns3_path)
+
+import analyze_trace  # noqa: E402
+
+sample_trace = os.path.join(ns3_path, "trace.tr")
+
+## Prefix of a trace line up to the IPv4 length field
+line_prefix = (
+    b"%s %s /NodeList/%d/DeviceList/0/$ns3::PointToPointNetDevice/TxQueue/Enqueue "
+    b"ns3::PppHeader (Point-to-Point Protocol: IP (0x0021)) ns3::Ipv4Header "
+    b"(tos 0x0 DSCP Default ECN Not-ECT ttl 64 id 0 protocol %d offset (bytes) 0 "
+    b"flags [none] length: %d 10.1.1.1 > 10.1.1.2)"
+)
+
+## TCP data segment with flags and sequence number
+tcp_line = line_prefix % (b"+", b"1.0", 0, 6, 1052) + (
+    b" ns3::TcpHeader (49153 > 5000 [ACK] Seq=1 Ack=1 Win=65535)\n"
+)
+
+## UDP datagram without a TcpHeader
+udp_line = line_prefix % (b"r", b"2.0", 1, 17, 540) + (
+    b" ns3::UdpHeader (length: 520 49153 > 9)\n"
+)
+
+
+class AnalyzeTraceParallelTestCase(unittest.TestCase):
+    """!
+    Checks that splitting a trace into chunks does not change the report
+    """
+
+    ## Number of copies of the sample trace in the test file
+    copies = 20
+
+    ## Minimum chunk size forcing the test file to be split
+    min_chunk_size = 64 * 1024
+
+    def setUp(self):
+        """!
+        Creates a multi-chunk trace from several copies of the sample trace
+        @param self: the current test context
+        @return None
+        """
+        self.temp_dir = tempfile.mkdtemp()
+        self.trace_file = os.path.join(self.temp_dir, "trace.tr")
+        with open(sample_trace, "rb") as f:
+            data = f.read()
+        with open(self.trace_file, "wb") as f:
+            f.write(data * self.copies)
+
+    def tearDown(self):
+        """!
+        Removes the temporary trace and reports
+        @param self: the current test context
+        @return None
+        """
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def run_analysis(self, jobs):
+        """!
+        Runs analyze_trace and returns the report without the date line
+        @param self: the current test context
+        @param jobs: number of worker processes
+        @return list of report lines
+        """
+        output_file = os.path.join(self.temp_dir, "report-%d.txt" % jobs)
+        with mock.patch.object(analyze_trace, "_MIN_CHUNK_SIZE", self.min_chunk_size):
+            with contextlib.redirect_stdout(io.StringIO()):
+                analyze_trace.analyze_trace(self.trace_file, output_file, jobs)
+        with open(output_file, encoding="utf-8") as f:
+            return [line for line in f if not line.startswith("Дата анализа:")]
+
+    def test_01_SplitChunks(self):
+        """!
+        Test that the file is split into contiguous chunks ending at line ends
+        @return None
+        """
+        with mock.patch.object(analyze_trace, "_MIN_CHUNK_SIZE", self.min_chunk_size):
+            chunks = analyze_trace.split_trace_chunks(self.trace_file, 4)
+
+        self.assertGreater(len(chunks), 1)
+        with open(self.trace_file, "rb") as f:
+            data = f.read()
+        start = 0
+        for _, chunk_start, chunk_end, _, collect_keys in chunks:
+            self.assertEqual(chunk_start, start)
+            self.assertTrue(collect_keys)
+            self.assertEqual(data[chunk_end - 1 : chunk_end], b"\n")
+            start = chunk_end
+        self.assertEqual(start, len(data))
+
+    def test_02_ParallelReportMatchesSingleProcess(self):
+        """!
+        Test that -j N and -j 1 produce the same report on a multi-chunk file
+        @return None
+        """
+        expected = self.run_analysis(1)
+        for jobs in (2, 4):
+            self.assertEqual(self.run_analysis(jobs), expected)
+
+    def test_03_SmallTraceSingleChunk(self):
+        """!
+        Test that a trace below the minimum chunk size is not split
+        @return None
+        """
+        self.assertLess(os.path.getsize(self.trace_file), analyze_trace._MIN_CHUNK_SIZE)
+        chunks = analyze_trace.split_trace_chunks(self.trace_file, 8)
+        self.assertEqual(len(chunks), 1)
+        # A single chunk is not merged, so its first-seen keys are not collected
+        self.assertFalse(chunks[0][4])
+
+
+class AnalyzeTraceUnknownPacketTestCase(unittest.TestCase):
+    """!
+    Checks the handling of packets without a TCP sequence number
+    """
+
+    def setUp(self):
+        """!
+        Creates a trace with a retransmitted TCP segment and a UDP datagram
+        @param self: the current test context
+        @return None
+        """
+        self.temp_dir = tempfile.mkdtemp()
+        self.trace_file = os.path.join(self.temp_dir, "trace.tr")
+        with open(self.trace_file, "wb") as f:
+            f.write(tcp_line + tcp_line.replace(b"+ 1.0", b"+ 1.5") + udp_line)
+
+    def tearDown(self):
+        """!
+        Removes the temporary trace and report
+        @param self: the current test context
+        @return None
+        """
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_01_ParseUnknown(self):
+        """!
+        Test that a line without a TcpHeader has no sequence number
+        @return None
+        """
+        event, time, node, size, seq, packet_type = analyze_trace.parse_trace_line(udp_line)
+        self.assertEqual((chr(event), time, node, seq, packet_type), ("r", 2.0, 1, None, "Unknown"))
+
+    def test_02_UnknownCountedInTotals(self):
+        """!
+        Test that unknown packets count in the totals but not as retransmissions
+        @return None
+        """
+        total_bytes = sum(
+            analyze_trace.parse_trace_line(line)[3] for line in (tcp_line, tcp_line, udp_line)
+        )
+        output_file = os.path.join(self.temp_dir, "report.txt")
+        with contextlib.redirect_stdout(io.StringIO()):
+            analyze_trace.analyze_trace(self.trace_file, output_file, 1)
+        with open(output_file, encoding="utf-8") as f:
+            report = f.read().splitlines()
+
+        self.assertIn("Общее число пакетов с данными: 3", report)
+        self.assertIn("Число повторных передач: 1", report)
+        self.assertIn("Общий объём данных: %d байт (%.2f KB)" % (total_bytes, total_bytes / 1024), report)
+        self.assertIn("Unknown: 1 пакетов", report)
+        self.assertIn("Уникальных потоков: 2", report)
+
+
+class AnalyzeTraceParserTestCase(unittest.TestCase):
+    """!
+    Checks the generated parsers against the generic parse_trace_line
+    """
+
+    ## Lines covering every optional TcpHeader field and unparsable input
+    lines = [
+        tcp_line,
+        tcp_line.replace(b"[ACK] ", b""),
+        tcp_line.replace(b"Seq=1 ", b""),
+        tcp_line.replace(b"[ACK] Seq=1 ", b""),
+        tcp_line.replace(b"[ACK]", b"[SYN|ACK]").replace(b"1052", b"56"),
+        tcp_line.replace(b"[ACK]", b"[FIN|ACK]"),
+        tcp_line.replace(b"1052", b"52"),
+        udp_line,
+        b"\n",
+        b"# comment\n",
+        b"garbage line without any fields\n",
+        tcp_line.replace(b"+ 1.0", b"+ 1"),
+        tcp_line.replace(b"+ 1.0", b"x 1.0"),
+        tcp_line.replace(b"length: 1052", b"len 1052"),
+    ]
+
+    def test_01_CompiledParsersMatchGeneric(self):
+        """!
+        Test that every parser variant returns what parse_trace_line returns
+        @return None
+        """
+        for flags_always in (False, True):
+            for seq_always in (False, True):
+                parse = analyze_trace._compile_parser(flags_always, seq_always)
+                for line in self.lines:
+                    with self.subTest(flags_always=flags_always, seq_always=seq_always, line=line):
+                        self.assertEqual(parse(line), analyze_trace.parse_trace_line(line))
+
+
+if __name__ == "__main__":
+    unittest.main()